@@ -6,20 +6,30 @@
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
+import array
 import logging
 import mmap
 import struct
+import sys
 
 from collections import namedtuple
 
 Position = namedtuple('Position', 'method file line')
-MapEntry = namedtuple('MapEntry', 'class_id method_id file_id line parent')
+
+# Typecode of a 4-byte unsigned int, matching the '<L' fields of the map.
+UINT32_TYPECODE = 'I' if array.array('I').itemsize == 4 else 'L'
 
 
 class PositionMap(object):
+    # Map entries are kept as parallel arrays (one per field) instead of a
+    # tuple per entry; line maps of large apps have millions of entries.
     def __init__(self):
         self.string_pool = []
-        self.positions = []
+        self.class_ids = None
+        self.method_ids = None
+        self.file_ids = array.array(UINT32_TYPECODE)
+        self.lines = array.array(UINT32_TYPECODE)
+        self.parents = array.array(UINT32_TYPECODE)
 
     @staticmethod
     def read_from(filename):
@@ -33,35 +43,44 @@ class PositionMap(object):
                 raise Exception('Version mismatch')
             spool_count = struct.unpack('<L', mapping.read(4))[0]
             pmap = PositionMap()
+            # Interned so that repeated pool entries (file names in particular)
+            # share a single string object
             for i in range(0, spool_count):
                 ssize = struct.unpack('<L', mapping.read(4))[0]
-                pmap.string_pool.append(mapping.read(ssize).decode('ascii'))
+                pmap.string_pool.append(
+                    sys.intern(mapping.read(ssize).decode('ascii')))
             logging.info('Unpacked %d strings from line map', spool_count)
             pos_count = struct.unpack('<L', mapping.read(4))[0]
-            # this is pretty slow; it would be much faster in C++ with memcpy
-            # and arrays of structs, but I don't know how to call C/C++ from
-            # Python under our build system
-            for i in range(0, pos_count):
-                if version == 1:
-                    pmap.positions.append(MapEntry._make(
-                        (None, None) + struct.unpack('<LLL',
-                            mapping.read(12))))
-                else:
-                    pmap.positions.append(MapEntry._make(struct.unpack(
-                        '<LLLLL', mapping.read(20))))
+            # Read all entries in one go and split the fields out with strided
+            # slices rather than unpacking entry by entry
+            fields = 3 if version == 1 else 5
+            entries = array.array(UINT32_TYPECODE)
+            entries.frombytes(mapping.read(pos_count * fields * 4))
+            if len(entries) != pos_count * fields:
+                raise Exception('Truncated line map')
+            if sys.byteorder != 'little':
+                entries.byteswap()
+            if version == 2:
+                pmap.class_ids = entries[0::5]
+                pmap.method_ids = entries[1::5]
+            # file_id, line and parent are always the trailing three fields
+            first = fields - 3
+            pmap.file_ids = entries[first::fields]
+            pmap.lines = entries[first + 1::fields]
+            pmap.parents = entries[first + 2::fields]
             logging.info('Unpacked %d map entries from line map', pos_count)
             return pmap
 
     def get_stack(self, idx):
         stack = []
-        while idx >= 0 and idx < len(self.positions):
-            pi = self.positions[idx]
-            if pi.class_id is not None:
-                method = self.string_pool[pi.class_id] + '.' +\
-                        self.string_pool[pi.method_id]
+        while idx >= 0 and idx < len(self.lines):
+            if self.class_ids is not None:
+                method = self.string_pool[self.class_ids[idx]] + '.' +\
+                        self.string_pool[self.method_ids[idx]]
             else:
                 method = None
-            stack.append(Position(method, self.string_pool[pi.file_id],
-                                  pi.line))
-            idx = pi.parent - 1
+            stack.append(Position(method,
+                                  self.string_pool[self.file_ids[idx]],
+                                  self.lines[idx]))
+            idx = self.parents[idx] - 1
         return stack
@@ -20,6 +20,8 @@ class LogcatSymbolicator(object):
         re.MULTILINE,
     )
 
+    LOG_LINE_REGEX = re.compile(r"[A-Z]/[A-Za-z0-9_$](\s*\d+):")
+
     def __init__(self, symbol_maps):
         self.symbol_maps = symbol_maps
 
@@ -64,6 +66,9 @@ class LogcatSymbolicator(object):
                 )
         return result
 
+    def is_chunk_boundary(self, line):
+        return True
+
     def symbolicate(self, line):
         line = self.CLASS_REGEX.sub(self.class_replacer, line)
         line = self.TRACE_REGEX.sub(self.line_replacer, line)
@@ -71,6 +76,6 @@ class LogcatSymbolicator(object):
 
     @staticmethod
     def is_likely_logcat(line):
-        return line.startswith("--------- beginning of") or re.match(
-            r"[A-Z]/[A-Za-z0-9_$](\s*\d+):", line
-        )
+        return line.startswith(
+            "--------- beginning of"
+        ) or LogcatSymbolicator.LOG_LINE_REGEX.match(line)
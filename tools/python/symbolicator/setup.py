@@ -0,0 +1,16 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+# Optionally compiles the dexdump symbolicator with mypyc:
+#
+#     python setup.py build_ext --inplace
+#
+# The resulting extension module sits next to dexdump.py and is imported in
+# its place; without it, the pure-Python module is used.
+
+from mypyc.build import mypycify
+from setuptools import setup
+
+setup(name="symbolicator", ext_modules=mypycify(["dexdump.py"]))
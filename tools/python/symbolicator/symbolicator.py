@@ -9,9 +9,17 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 import argparse
+import collections
+import concurrent.futures
+import functools
+import hashlib
 import io
+import itertools
 import logging
+import mmap
+import multiprocessing
 import os
+import pickle
 import re
 import signal
 import sys
@@ -23,6 +31,36 @@ from line_unmap import PositionMap
 from logcat import LogcatSymbolicator
 from symbol_files import SymbolFiles
 
+try:
+    import marisa_trie
+except ImportError:
+    marisa_trie = None
+
+
+READ_BUFFER_SIZE = 1 << 20
+# Number of symbolicated lines collected before writing them out. Logcat is
+# exempt, see main().
+WRITE_BATCH_LINES = 1024
+# Minimum number of input lines handed to a worker process with --jobs.
+PARALLEL_CHUNK_LINES = 4096
+
+# Parsed class maps are cached under $XDG_CACHE_HOME/symbolicator, keyed by
+# the mapping file's path, mtime and size. Bump the version whenever the
+# output of parse_class_map changes so that stale entries are not reused.
+CLASS_MAP_CACHE_VERSION = 2
+CLASS_MAP_CACHE_PICKLE_PROTOCOL = 4
+# Number of most recently used class maps kept in the cache.
+CLASS_MAP_CACHE_ENTRIES = 4
+# Setting this environment variable to a non-empty value disables the cache.
+CLASS_MAP_CACHE_DISABLE_ENV = "SYMBOLICATOR_NO_CACHE"
+
+# Matches class lines of a ProGuard-style mapping, i.e. `original -> new:`.
+# Member lines are indented and therefore skipped. The pattern starts at the
+# preceding newline, which lets the regex engine skip ahead to candidate
+# lines instead of trying every position; the first line of the file is
+# matched separately.
+CLASS_MAPPING_REGEX = re.compile(rb"\n(\S[^\n]*?) -> ([^\n]*):[ \t\r]*$", re.MULTILINE)
+
 
 # A simple symbolicator for line-based input,
 # i.e. a newline separated list of class names to be symbolicated.
@@ -30,6 +68,9 @@ class LinesSymbolicator(object):
     def __init__(self, symbol_maps):
         self.symbol_maps = symbol_maps
 
+    def is_chunk_boundary(self, line):
+        return True
+
     def symbolicate(self, line):
         class_name = line[:-7]  # strip '.class' suffix.
         class_name = class_name.replace("/", ".")
@@ -40,9 +81,27 @@ class LinesSymbolicator(object):
         return line
 
 
+# Read-only map from class descriptor to class descriptor, stored in a
+# marisa-trie so that the shared package prefixes are only kept once.
+class DescriptorTrie(object):
+    def __init__(self, mapping):
+        self.trie = marisa_trie.BytesTrie(
+            (k, v.encode("utf-8")) for k, v in mapping.items()
+        )
+
+    def get(self, descriptor):
+        values = self.trie.get(descriptor)
+        if values:
+            return values[0].decode("utf-8")
+        return None
+
+
 class SymbolMaps(object):
     def __init__(self, symbol_files):
         self.class_map = self.get_class_map(symbol_files.extracted_symbols)
+        # Same mapping in descriptor form, so dexdump can look up class
+        # descriptors without converting them first.
+        self.class_map_slash = self.get_descriptor_map(self.class_map)
         self.line_map = PositionMap.read_from(symbol_files.line_map)
         self.debug_line_map = (
             DebugLineMap.read_from(symbol_files.debug_line_map)
@@ -64,17 +123,167 @@ class SymbolMaps(object):
         else:
             self.iodi_metadata = None
 
+    @staticmethod
+    def get_descriptor_map(class_map):
+        mapping = {
+            k.replace(".", "/"): v.replace(".", "/") for k, v in class_map.items()
+        }
+        if marisa_trie is None:
+            logging.info("Using a dict for the class descriptor map")
+            return mapping
+        logging.info("Using marisa-trie for the class descriptor map")
+        return DescriptorTrie(mapping)
+
+    @staticmethod
+    def get_class_map_cache_dir():
+        cache_home = os.environ.get("XDG_CACHE_HOME", "")
+        if not os.path.isabs(cache_home):
+            cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cache_home, "symbolicator")
+
     @staticmethod
     def get_class_map(mapping_filename):
-        mapping = {}
-        with open(mapping_filename) as f:
-            for line in f:
-                if " -> " in line and line[0] != " ":
-                    original, _sep, new = line.partition(" -> ")
-                    new = new.strip()[:-1]
-                    mapping[new] = original
+        if os.environ.get(CLASS_MAP_CACHE_DISABLE_ENV):
+            return SymbolMaps.parse_class_map(mapping_filename)
+
+        stat = os.stat(mapping_filename)
+        cache_key = "%d:%s:%d:%d" % (
+            CLASS_MAP_CACHE_VERSION,
+            os.path.abspath(mapping_filename),
+            stat.st_mtime_ns,
+            stat.st_size,
+        )
+        cache_dir = SymbolMaps.get_class_map_cache_dir()
+        cache_filename = os.path.join(
+            cache_dir, hashlib.sha1(cache_key.encode("utf-8")).hexdigest() + ".pickle"
+        )
+        try:
+            with open(cache_filename, "rb") as f:
+                mapping = pickle.load(f)
+            if not isinstance(mapping, dict):
+                raise TypeError("expected a dict, got " + type(mapping).__name__)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Whatever is in there can't be used; drop it so that it gets
+            # rebuilt below.
+            logging.warning("Ignoring bad class map cache %s: %s", cache_filename, e)
+            SymbolMaps.remove_quietly(cache_filename)
+        else:
+            try:
+                # Marks the entry as recently used for pruning.
+                os.utime(cache_filename)
+            except OSError:
+                pass
+            return mapping
+
+        mapping = SymbolMaps.parse_class_map(mapping_filename)
+        tmp_filename = "%s.%d.tmp" % (cache_filename, os.getpid())
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp_filename, "wb") as f:
+                pickle.dump(mapping, f, CLASS_MAP_CACHE_PICKLE_PROTOCOL)
+            os.replace(tmp_filename, cache_filename)
+            SymbolMaps.prune_class_map_cache(cache_dir)
+        except OSError as e:
+            logging.warning("Unable to cache class map: %s", e)
+            SymbolMaps.remove_quietly(tmp_filename)
         return mapping
 
+    @staticmethod
+    def prune_class_map_cache(cache_dir):
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".pickle"):
+                path = os.path.join(cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    # Removed concurrently by another run.
+                    pass
+        entries.sort(reverse=True)
+        for _mtime, path in entries[CLASS_MAP_CACHE_ENTRIES:]:
+            SymbolMaps.remove_quietly(path)
+
+    @staticmethod
+    def remove_quietly(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def parse_class_map(mapping_filename):
+        with open(mapping_filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return {}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                first = CLASS_MAPPING_REGEX.match(b"\n" + data.readline())
+                pairs = CLASS_MAPPING_REGEX.findall(data)
+        if first is not None:
+            pairs.insert(0, first.groups())
+        return {
+            new.decode("utf-8"): original.decode("utf-8") for original, new in pairs
+        }
+
+
+# The symbolicator used by --jobs worker processes. It is set before the
+# workers are forked, so they share the parsed symbol maps with the parent
+# instead of loading them again.
+_worker_symbolicator = None
+
+
+def write_to_fd(fd, s):
+    # Output is already batched, so encode it in one go and hand it straight
+    # to the file descriptor rather than going through a TextIOWrapper.
+    data = memoryview(s.encode("utf-8", "surrogateescape"))
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+def symbolicate_chunk(lines):
+    symbolicate = _worker_symbolicator.symbolicate
+    out = []
+    for line in lines:
+        s = symbolicate(line)
+        if s is not None:
+            out.append(s)
+    return "".join(out)
+
+
+def split_chunks(symbolicator, lines, chunk_lines):
+    """
+    Groups lines into chunks of at least chunk_lines lines. A new chunk only
+    starts at a line where the symbolicator's state is reset, so each chunk
+    can be symbolicated independently.
+    """
+    is_chunk_boundary = symbolicator.is_chunk_boundary
+    chunk = []
+    for line in lines:
+        if len(chunk) >= chunk_lines and is_chunk_boundary(line):
+            yield chunk
+            chunk = []
+        chunk.append(line)
+    if chunk:
+        yield chunk
+
+
+def symbolicate_parallel(symbolicator, lines, write, jobs):
+    global _worker_symbolicator
+    _worker_symbolicator = symbolicator
+    # Bound the number of chunks in flight so that we don't read all of the
+    # input ahead of the output.
+    in_flight = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        for chunk in split_chunks(symbolicator, lines, PARALLEL_CHUNK_LINES):
+            in_flight.append(executor.submit(symbolicate_chunk, chunk))
+            if len(in_flight) >= 2 * jobs:
+                write(in_flight.popleft().result())
+        while in_flight:
+            write(in_flight.popleft().result())
+
 
 def parse_args(args):
     """
@@ -111,11 +320,22 @@ Examples of usage:
     parser.add_argument(
         "--input-type", type=str, choices=("logcat", "dexdump", "lines")
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes to symbolicate with. Output is "
+        "produced in chunks, so this is meant for large batch inputs like "
+        "dexdump rather than live logcat streams",
+    )
     if args is not None:
         for flag, arg in args:
             parser.add_argument(flag, **arg)
 
-    return parser.parse_args()
+    parsed = parser.parse_args()
+    if parsed.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    return parsed
 
 
 def main(arg_desc=None, symbol_file_generator=None):
@@ -144,11 +364,11 @@ def main(arg_desc=None, symbol_file_generator=None):
         signal.signal(signal.SIGINT, signal.SIG_IGN)
 
     reader = io.TextIOWrapper(
-        sys.stdin.buffer, encoding="utf-8", errors="surrogateescape"
-    )
-    writer = io.TextIOWrapper(
-        sys.stdout.buffer, encoding="utf-8", errors="surrogateescape"
+        io.BufferedReader(sys.stdin.buffer.raw, buffer_size=READ_BUFFER_SIZE),
+        encoding="utf-8",
+        errors="surrogateescape",
     )
+    stdout_fd = sys.stdout.fileno()
 
     first_line = ""
     while first_line == "":
@@ -172,13 +392,30 @@ def main(arg_desc=None, symbol_file_generator=None):
 
     logging.info("Using %s", type(symbolicator).__name__)
 
-    def output(s):
-        if s is not None:
-            writer.write(s)
+    lines = itertools.chain((first_line,), reader)
+    write = functools.partial(write_to_fd, stdout_fd)
+    if args.jobs > 1:
+        symbolicate_parallel(symbolicator, lines, write, args.jobs)
+        return
 
-    output(symbolicator.symbolicate(first_line))
-    for line in reader:
-        output(symbolicator.symbolicate(line))
+    # Logcat is usually a live stream (e.g. `adb logcat`), where batching would
+    # hold back a crash trace until more log arrives, so write it line by line.
+    batch_lines = (
+        1 if isinstance(symbolicator, LogcatSymbolicator) else WRITE_BATCH_LINES
+    )
+
+    # Bound methods are hoisted into locals since this loop runs per line.
+    pending = []
+    append = pending.append
+    symbolicate = symbolicator.symbolicate
+    for line in lines:
+        s = symbolicate(line)
+        if s is not None:
+            append(s)
+            if len(pending) >= batch_lines:
+                write("".join(pending))
+                pending.clear()
+    write("".join(pending))
 
 
 if __name__ == "__main__":
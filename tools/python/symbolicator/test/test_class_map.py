@@ -0,0 +1,58 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from symbolicator import SymbolMaps
+
+
+class TestParseClassMap(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def parse(self, data):
+        path = os.path.join(self.tmpdir, "mapping.txt")
+        with open(path, "wb") as f:
+            f.write(data)
+        return SymbolMaps.parse_class_map(path)
+
+    def test_first_line(self):
+        self.assertEqual(self.parse(b"com.Foo -> X.a:\n"), {"X.a": "com.Foo"})
+
+    def test_no_trailing_newline(self):
+        self.assertEqual(
+            self.parse(b"com.Foo -> X.a:\ncom.Bar -> X.b:"),
+            {"X.a": "com.Foo", "X.b": "com.Bar"},
+        )
+
+    def test_crlf(self):
+        self.assertEqual(
+            self.parse(b"com.Foo -> X.a:\r\ncom.Bar$Inner -> X.b:\r\n"),
+            {"X.a": "com.Foo", "X.b": "com.Bar$Inner"},
+        )
+
+    def test_member_lines(self):
+        self.assertEqual(
+            self.parse(
+                b"# compiler: R8\n"
+                b"com.Foo -> X.a:\n"
+                b"    int field -> a\n"
+                b"    void method(int) -> b\n"
+                b"\n"
+                b"com.Bar -> X.b:\n"
+            ),
+            {"X.a": "com.Foo", "X.b": "com.Bar"},
+        )
+
+    def test_empty(self):
+        self.assertEqual(self.parse(b""), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+from types import SimpleNamespace
+
+from dexdump import DexdumpSymbolicator
+
+
+class FakeDebugLineMap(object):
+    def __init__(self, lines):
+        self.lines = lines
+
+    def find_line_number(self, method_id, line):
+        return self.lines.get((method_id, line), 0)
+
+
+class FakeLineMap(object):
+    def get_stack(self, idx):
+        return [SimpleNamespace(file="Foo.java", line=idx)]
+
+
+class TestDexdumpSymbolicator(unittest.TestCase):
+    def setUp(self):
+        self.symbolicator = DexdumpSymbolicator(
+            SimpleNamespace(
+                class_map_slash={"X/a": "com/Foo"},
+                line_map=FakeLineMap(),
+                debug_line_map=FakeDebugLineMap({(7, 1): 10, (7, 2): 10, (7, 3): 20}),
+                iodi_metadata=SimpleNamespace(collision_free={"X.a.run": 7}),
+            )
+        )
+
+    def symbolicate(self, lines):
+        return [self.symbolicator.symbolicate(line) for line in lines]
+
+    def enter_method(self):
+        self.assertEqual(
+            self.symbolicate(
+                [
+                    "Class #0            -\n",
+                    "  Direct methods    -\n",
+                    "    #0              : (in LX/a;)\n",
+                    "      name          : 'run'\n",
+                ]
+            ),
+            [
+                "Class #0            -\n",
+                "  Direct methods    -\n",
+                "    #0              : (in Lcom/Foo;)\n",
+                "      name          : 'run'\n",
+            ],
+        )
+        self.assertEqual(self.symbolicator.current_method_id, 7)
+
+    def test_remaps_line_entry(self):
+        self.enter_method()
+        self.assertEqual(
+            self.symbolicate(["        0x0000 line=1\n", "        0x0004 line=3\n"]),
+            ["        0x0000 line=Foo.java:9\n", "        0x0004 line=Foo.java:19\n"],
+        )
+
+    def test_suppresses_duplicate_line_entry(self):
+        self.enter_method()
+        self.assertEqual(
+            self.symbolicate(["        0x0000 line=1\n", "        0x0002 line=2\n"]),
+            ["        0x0000 line=Foo.java:9\n", None],
+        )
+
+    def test_splices_unmapped_line_entry(self):
+        # No IODI mapping for this line, so the line number itself is looked
+        # up in the line map.
+        self.enter_method()
+        self.assertEqual(
+            self.symbolicate(["        0x0006 line=5  \n"]),
+            ["        0x0006 line=Foo.java:4  \n"],
+        )
+
+    def test_class_and_line_entry_on_one_line(self):
+        self.assertEqual(
+            self.symbolicate(["        0x0000 line=5 LX/a; LX/b;\n"]),
+            ["        0x0000 line=Foo.java:4 Lcom/Foo; LX/b;\n"],
+        )
+
+    def test_section_header_resets_state(self):
+        self.enter_method()
+        self.assertIsNone(
+            self.symbolicator.handle_indented_line("  Static fields     -\n")
+        )
+        self.assertFalse(self.symbolicator.reading_methods)
+        self.assertIsNone(self.symbolicator.current_class)
+        self.assertIsNone(self.symbolicator.current_method_id)
+        self.assertEqual(
+            self.symbolicate(["        0x0000 line=1\n"]),
+            ["        0x0000 line=Foo.java:0\n"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from line_unmap import Position, PositionMap
+
+
+class TestPositionMap(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write_line_map(self, version, strings, entries):
+        data = struct.pack("<LLL", 0xFACEB000, version, len(strings))
+        for s in strings:
+            data += struct.pack("<L", len(s)) + s.encode("ascii")
+        data += struct.pack("<L", len(entries))
+        form = "<LLL" if version == 1 else "<LLLLL"
+        for entry in entries:
+            data += struct.pack(form, *entry)
+        path = os.path.join(self.tmpdir, "line-map-v%d" % version)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_v1(self):
+        # (file_id, line, parent)
+        path = self.write_line_map(
+            1, ["A.java", "B.java"], [(0, 10, 0), (1, 20, 1), (0, 30, 2)]
+        )
+        pmap = PositionMap.read_from(path)
+        self.assertEqual(
+            pmap.get_stack(2),
+            [
+                Position(None, "A.java", 30),
+                Position(None, "B.java", 20),
+                Position(None, "A.java", 10),
+            ],
+        )
+        self.assertEqual(pmap.get_stack(0), [Position(None, "A.java", 10)])
+        self.assertEqual(pmap.get_stack(3), [])
+        self.assertEqual(pmap.get_stack(-1), [])
+
+    def test_v2(self):
+        # (class_id, method_id, file_id, line, parent)
+        path = self.write_line_map(
+            2,
+            ["com.Foo", "bar", "Foo.java", "baz", "Baz.java"],
+            [(0, 1, 2, 5, 0), (0, 3, 4, 7, 1)],
+        )
+        pmap = PositionMap.read_from(path)
+        self.assertEqual(
+            pmap.get_stack(1),
+            [
+                Position("com.Foo.baz", "Baz.java", 7),
+                Position("com.Foo.bar", "Foo.java", 5),
+            ],
+        )
+        self.assertEqual(pmap.get_stack(0), [Position("com.Foo.bar", "Foo.java", 5)])
+
+    def test_truncated(self):
+        path = self.write_line_map(
+            2,
+            ["com.Foo", "bar", "Foo.java"],
+            [(0, 1, 2, line, 0) for line in range(10)],
+        )
+        with open(path, "rb+") as f:
+            f.truncate(os.path.getsize(path) - 8)
+        with self.assertRaisesRegex(Exception, "Truncated line map"):
+            PositionMap.read_from(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
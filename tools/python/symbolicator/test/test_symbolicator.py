@@ -0,0 +1,193 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from dexdump import DexdumpSymbolicator
+import symbolicator
+from symbolicator import SymbolMaps, split_chunks
+
+
+class SymbolicatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write_file(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class TestClassMapCache(SymbolicatorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = os.path.join(self.tmpdir, "cache", "symbolicator")
+        patcher = mock.patch.dict(
+            os.environ, {"XDG_CACHE_HOME": os.path.join(self.tmpdir, "cache")}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop(symbolicator.CLASS_MAP_CACHE_DISABLE_ENV, None)
+
+    def cache_entries(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_round_trip(self):
+        path = self.write_file("mapping.txt", b"com.Foo -> X.a:\n")
+        self.assertEqual(SymbolMaps.get_class_map(path), {"X.a": "com.Foo"})
+        self.assertEqual(len(self.cache_entries()), 1)
+        self.assertEqual(SymbolMaps.get_class_map(path), {"X.a": "com.Foo"})
+
+    def test_bad_entry_is_rebuilt(self):
+        path = self.write_file("mapping.txt", b"com.Foo -> X.a:\n")
+        SymbolMaps.get_class_map(path)
+        (entry,) = self.cache_entries()
+        for garbage in (b"", b"\x80\x05garbage", b"\x80\x04K\x01."):
+            with open(os.path.join(self.cache_dir, entry), "wb") as f:
+                f.write(garbage)
+            self.assertEqual(SymbolMaps.get_class_map(path), {"X.a": "com.Foo"})
+            self.assertEqual(self.cache_entries(), [entry])
+
+    def test_prunes_old_entries(self):
+        for i in range(symbolicator.CLASS_MAP_CACHE_ENTRIES + 2):
+            path = self.write_file("mapping%d.txt" % i, b"com.Foo -> X.a:\n")
+            SymbolMaps.get_class_map(path)
+        self.assertEqual(
+            len(self.cache_entries()), symbolicator.CLASS_MAP_CACHE_ENTRIES
+        )
+
+    def test_disabled(self):
+        path = self.write_file("mapping.txt", b"com.Foo -> X.a:\n")
+        with mock.patch.dict(
+            os.environ, {symbolicator.CLASS_MAP_CACHE_DISABLE_ENV: "1"}
+        ):
+            self.assertEqual(SymbolMaps.get_class_map(path), {"X.a": "com.Foo"})
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+class TestSplitChunks(unittest.TestCase):
+    LINES = [
+        "Class #0            -\n",
+        "  Direct methods    -\n",
+        "        0x0000 line=1\n",
+        "        0x0001 line=2\n",
+        "Class #1            -\n",
+        "        0x0000 line=3\n",
+    ]
+
+    def split(self, iodi_metadata):
+        dexdump = DexdumpSymbolicator(SimpleNamespace(iodi_metadata=iodi_metadata))
+        return list(split_chunks(dexdump, self.LINES, 1))
+
+    def test_splits_anywhere_without_iodi(self):
+        self.assertEqual(self.split(None), [[line] for line in self.LINES])
+
+    def test_splits_only_at_class_headers_with_iodi(self):
+        self.assertEqual(self.split(object()), [self.LINES[:4], self.LINES[4:]])
+
+
+class FakeDebugLineMap(object):
+    def find_line_number(self, method_id, line):
+        # Pairs of consecutive lines collapse onto one mapped line, so some
+        # entries are dropped as duplicates.
+        return method_id * 100 + line // 2 + 1
+
+
+class FakeLineMap(object):
+    def get_stack(self, idx):
+        return [SimpleNamespace(file="Foo.java", line=idx)]
+
+
+class TestSymbolicateParallel(unittest.TestCase):
+    def make_symbolicator(self):
+        return DexdumpSymbolicator(
+            SimpleNamespace(
+                class_map_slash={"X/a": "com/Foo"},
+                line_map=FakeLineMap(),
+                debug_line_map=FakeDebugLineMap(),
+                iodi_metadata=SimpleNamespace(
+                    collision_free={"X.a%d.run" % i: i for i in range(0, 10, 2)}
+                ),
+            )
+        )
+
+    def make_lines(self):
+        lines = []
+        for i in range(10):
+            lines += [
+                "Class #%d            -\n" % i,
+                "  Class descriptor  : 'LX/a%d;'\n" % i,
+                "  Static fields     -\n",
+                "    #0              : (in LX/a;)\n",
+                "  Direct methods    -\n",
+                "    #0              : (in LX/a%d;)\n" % i,
+                "      name          : 'run'\n",
+                "      positions     : \n",
+            ]
+            lines += ["        0x%04x line=%d\n" % (j, j + 1) for j in range(6)]
+        return lines
+
+    def test_matches_serial(self):
+        serial = self.make_symbolicator()
+        expected = "".join(
+            s for s in map(serial.symbolicate, self.make_lines()) if s is not None
+        )
+        out = []
+        with mock.patch.object(symbolicator, "PARALLEL_CHUNK_LINES", 7):
+            symbolicator.symbolicate_parallel(
+                self.make_symbolicator(), self.make_lines(), out.append, 2
+            )
+        self.assertGreater(len(out), 1)
+        self.assertEqual("".join(out), expected)
+
+
+class FakeBytesTrie(object):
+    def __init__(self, items):
+        self.items = {}
+        for k, v in items:
+            self.items.setdefault(k, []).append(v)
+
+    def get(self, key):
+        return self.items.get(key)
+
+
+class TestDescriptorMap(unittest.TestCase):
+    def replace_classes(self, class_map_slash, line):
+        dexdump = DexdumpSymbolicator(
+            SimpleNamespace(class_map_slash=class_map_slash, iodi_metadata=None)
+        )
+        return dexdump.symbolicate(line)
+
+    def test_dict(self):
+        with mock.patch.object(symbolicator, "marisa_trie", None):
+            class_map_slash = SymbolMaps.get_descriptor_map({"X.a": "com.Foo"})
+        self.assertIsInstance(class_map_slash, dict)
+        self.assertEqual(
+            self.replace_classes(class_map_slash, "LX/a; LX/b;\n"),
+            "Lcom/Foo; LX/b;\n",
+        )
+
+    def test_trie(self):
+        fake_marisa_trie = SimpleNamespace(BytesTrie=FakeBytesTrie)
+        with mock.patch.object(symbolicator, "marisa_trie", fake_marisa_trie):
+            class_map_slash = SymbolMaps.get_descriptor_map({"X.a": "com.Foo"})
+        self.assertIsInstance(class_map_slash, symbolicator.DescriptorTrie)
+        self.assertEqual(class_map_slash.get("X/a"), "com/Foo")
+        self.assertIsNone(class_map_slash.get("X/b"))
+        self.assertEqual(
+            self.replace_classes(class_map_slash, "LX/a; LX/b;\n"),
+            "Lcom/Foo; LX/b;\n",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()